@@ -1,22 +1,41 @@
 import streamlit as st
-import openai
-import pdfplumber  # PDF text extraction with layout preservation
 import io
+import json
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime
+import hashlib
+import importlib.machinery
 import os
-from typing import Optional, Dict, Any
+import time
+from typing import Optional, Dict, Any, Tuple
 import re
+import tempfile
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from pdf_extraction import extract_page_range
+
+# Streamlit runs this script as a stand-in __main__ module. Giving it a
+# "__main__" spec tells multiprocessing's spawn/forkserver start-up there is
+# no main module to re-run, so extraction workers import pdf_extraction only
+# instead of executing the whole app
+if __name__ == "__main__" and __spec__ is None:
+    __spec__ = importlib.machinery.ModuleSpec("__main__", None)
+
+# orjson (optional) encodes the request and parses the per-token stream
+# events several times faster than the stdlib json module
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:
+    _json_loads = json.loads
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode("utf-8")
 
-# Clean up any proxy-related environment variables that might interfere
-if 'HTTP_PROXY' in os.environ:
-    del os.environ['HTTP_PROXY']
-if 'HTTPS_PROXY' in os.environ:
-    del os.environ['HTTPS_PROXY']
-if 'http_proxy' in os.environ:
-    del os.environ['http_proxy']
-if 'https_proxy' in os.environ:
-    del os.environ['https_proxy']
 
 # Set page configuration
 st.set_page_config(
@@ -27,8 +46,7 @@ st.set_page_config(
 )
 
 # Custom CSS for better UI
-st.markdown("""
-<style>
+APP_CSS = """
     .main-header {
         text-align: center;
         color: #2E86AB;
@@ -76,86 +94,28 @@ st.markdown("""
         border-radius: 5px;
         margin: 1rem 0;
     }
-</style>
-""", unsafe_allow_html=True)
+"""
 
-class HealthCheckupAnalyzer:
-    def __init__(self):
-        self.setup_openai()
-        self.language_prompts = {
-            "English": "Provide the analysis in clear, professional English.",
-            "Hindi": "कृपया विश्लेषण स्पष्ट और व्यावसायिक हिंदी में प्रदान करें।",
-            "Hinglish": "Please provide the analysis in Hinglish (Hindi-English mix) that's easy to understand for Indian users."
-        }
-    
-    def setup_openai(self):
-        """Setup OpenAI API key - Always requires user input"""
-        if 'openai_api_key' not in st.session_state:
-            st.session_state.openai_api_key = ""
-        
-        # Clear any existing API key on app restart for security
-        if not st.session_state.openai_api_key:
-            st.session_state.openai_api_key = ""
-    
-    def extract_text_from_pdf(self, pdf_file) -> str:
-        """Extract text from PDF using pdfplumber with layout preservation and table detection"""
-        try:
-            # Read PDF file bytes
-            pdf_bytes = pdf_file.read()
-            extracted_text = ""
-            
-            # Open PDF with pdfplumber
-            with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-                page_count = len(pdf.pages)
-                
-                for page_num, page in enumerate(pdf.pages):
-                    # Extract text with layout preservation
-                    page_text = page.extract_text()
-                    
-                    if page_text and page_text.strip():
-                        extracted_text += f"\n--- Page {page_num + 1} ---\n"
-                        extracted_text += page_text + "\n"
-                        
-                        # Also extract tables if any
-                        tables = page.extract_tables()
-                        if tables:
-                            extracted_text += "\n--- Tables on this page ---\n"
-                            for table_num, table in enumerate(tables):
-                                extracted_text += f"Table {table_num + 1}:\n"
-                                for row in table:
-                                    if row and any(cell for cell in row if cell):
-                                        row_text = " | ".join(str(cell) if cell else "" for cell in row)
-                                        extracted_text += row_text + "\n"
-                                extracted_text += "\n"
-            
-            return extracted_text.strip()
-            
-        except Exception as e:
-            st.error(f"Error extracting text from PDF: {str(e)}")
-            return ""    
-    
-    def analyze_health_report(self, text: str, language: str) -> Dict[str, Any]:
-        """Analyze health report using OpenAI GPT"""
-        try:
-            # Validate API key
-            api_key = st.session_state.openai_api_key
-            if not api_key:
-                st.error("🔑 Please enter your OpenAI API key in the sidebar.")
-                return None
-            
-            if not api_key.startswith('sk-') or len(api_key) < 20:
-                st.error("❌ Invalid API key format. Please check your OpenAI API key.")
-                return None
-            
-            if not text or not text.strip():
-                st.error("📄 No text extracted from PDF to analyze.")
-                return None
-            
-            language_instruction = self.language_prompts.get(language, self.language_prompts["English"])
-            
-            prompt = f"""You are a medical AI assistant specializing in health report analysis. 
+@st.cache_data(show_spinner=False)
+def _app_css() -> str:
+    """Return the app stylesheet as a compact <style> tag, built once per process"""
+    # Streamlit re-sends every element on each rerun, so strip the
+    # indentation once instead of shipping it with every interaction
+    css = re.sub(r"\s*([{};])\s*", r"\1", APP_CSS.strip())
+    css = re.sub(r"\s+", " ", css)
+    return f"<style>{css}</style>"
+
+st.markdown(_app_css(), unsafe_allow_html=True)
+
+OPENAI_MODEL = "gpt-4o-mini"
+# Name shown in the UI and report; a model without an entry shows its API id
+OPENAI_MODEL_LABEL = {"gpt-4o-mini": "GPT-4o mini"}.get(OPENAI_MODEL, OPENAI_MODEL)
+
+# Fixed instructions are sent as the system message so that OpenAI's automatic
+# prompt caching can reuse them across calls; only the report text varies
+SYSTEM_PROMPT = """You are a medical AI assistant specializing in health report analysis.
 
-Please carefully analyze the following health checkup report text and provide:
+Please carefully analyze the health checkup report text provided by the user between <report> tags and provide:
 
 1. **SUMMARY**: A comprehensive summary of all test results across all pages
 2. **KEY FINDINGS**: Important findings and abnormal values (highlight which are outside normal ranges)
@@ -166,9 +126,7 @@ Please carefully analyze the following health checkup report text and provide:
 7. **FOLLOW-UP ACTIONS**: Which tests to repeat, when to consult doctors, and urgency levels
 8. **PREVENTIVE MEASURES**: Steps to prevent future health issues
 
-{language_instruction}
-
-Please analyze the health report text below. Look for:
+When analyzing the health report text, look for:
 - Lab test results and reference ranges
 - Vital signs and measurements
 - Any numerical values and their normal ranges
@@ -178,77 +136,190 @@ Please analyze the health report text below. Look for:
 
 Provide a detailed, structured analysis that's easy to understand for a non-medical person.
 Include specific actionable recommendations with clear priorities.
-If any values are critical or require immediate attention, highlight them clearly.
+If any values are critical or require immediate attention, highlight them clearly."""
 
-Health Report Text:
-{text}
+# Output language instruction per sidebar choice (also the selectbox options)
+LANGUAGE_PROMPTS = {
+    "English": "Provide the analysis in clear, professional English.",
+    "Hindi": "कृपया विश्लेषण स्पष्ट और व्यावसायिक हिंदी में प्रदान करें।",
+    "Hinglish": "Please provide the analysis in Hinglish (Hindi-English mix) that's easy to understand for Indian users."
+}
 
-Please provide a thorough analysis based on the extracted text content."""
+# Completion cap per output language. Hindi (Devanagari) and Hinglish take
+# noticeably more tokens for the same eight sections, so they keep the
+# larger budget
+LLM_MAX_TOKENS = {"English": 1500}
+LLM_MAX_TOKENS_DEFAULT = 2500
 
-            # Use OpenAI API directly with requests to bypass client initialization issues
-            
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            data = {
-                "model": "gpt-3.5-turbo",
-                "messages": [
-                    {"role": "system", "content": "You are a helpful medical AI assistant that provides health report analysis and recommendations."},
-                    {"role": "user", "content": prompt}
-                ],
-                "max_tokens": 2500,
-                "temperature": 0.7
-            }
-            
-            # Make the API request
-            response = requests.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers=headers,
-                json=data,
-                timeout=60
-            )
-            
-            if response.status_code != 200:
-                st.error(f"OpenAI API error: {response.status_code} - {response.text}")
-                return None
-            
-            response_data = response.json()
-            analysis = response_data['choices'][0]['message']['content']
-            
-            # Count pages from text (rough estimate)
-            pages_analyzed = text.count("--- Page") if "--- Page" in text else 1
-            
-            return {
-                "analysis": analysis,
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "language": language,
-                "pages_analyzed": pages_analyzed,
-                "extracted_text_length": len(text)
-            }
-            
-        except Exception as e:
-            st.error(f"Error analyzing health report: {str(e)}")
-            return None
+# Identical analyses within a session are served from st.session_state for a day
+LLM_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# Leave one core free for the Streamlit server so page workers don't starve it.
+# CPU affinity honours cpuset limits (taskset, docker --cpuset-cpus) where
+# os.cpu_count() reports the whole host; a cgroup CPU quota (docker --cpus)
+# is not visible here, which is what the hard cap of 4 is for, since every
+# worker is a long-lived copy of the server process. With 2 or fewer usable
+# CPUs this comes to 1 worker, and extraction always runs in-process
+_USABLE_CPUS = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 2)
+EXTRACTION_WORKERS = max(1, min(4, _USABLE_CPUS - 1))
+
+# Less text than this is a scanned/image-only PDF (or an empty one), not a
+# lab report worth an API call
+MIN_REPORT_TEXT_CHARS = 200
+
+# Tallest the report preview iframe gets, in pixels
+PREVIEW_MAX_HEIGHT = 20_000
+
+# Upper bound on report text sent to the model (~15k tokens); long scans
+# otherwise inflate latency and cost with little extra signal
+LLM_MAX_REPORT_CHARS = 60_000
+
+def _digest(*parts: str) -> str:
+    """Return a short blake2b hex key for the given strings (NUL-separated)"""
+    # Feeding the parts one by one avoids building a joined copy of the
+    # report text just to hash it
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Numbered lines ("3. HEALTH STATUS") in the model's answer
+_NUMBERED_LINE_RE = re.compile(r'^(\d+\.)\s*(.+)')
+# Numbered list items inside a section ("1. Walk 30 minutes daily"); the
+# space after the dot keeps values like "1.5 mg" out
+_NUMBERED_ITEM_RE = re.compile(r'^(\d+\.)\s+(.+)')
+
+# Value highlighting in the HTML report: numbers/ranges with optional unit,
+# status words, and markdown bold
+_MEDICAL_VALUE_RE = re.compile(r'(\d+(?:\.\d+)?(?:\s*[-–]\s*\d+(?:\.\d+)?)?(?:\s*(?:mg|g|kg|lb|cm|mm|%|bpm|mmHg|mg/dL|g/dL|mL|L|units?|IU)\b)?)')
+IMPORTANT_TERMS = (
+    'HIGH', 'LOW', 'NORMAL', 'ABNORMAL', 'CRITICAL', 'URGENT', 'IMMEDIATE',
+    'ELEVATED', 'DECREASED', 'BORDERLINE', 'OPTIMAL', 'GOOD', 'POOR',
+    'RECOMMENDED', 'AVOID', 'INCREASE', 'DECREASE', 'MAINTAIN', 'MONITOR'
+)
+_MEDICAL_TERM_RE = re.compile(r'\b(' + '|'.join(IMPORTANT_TERMS) + r')\b', re.IGNORECASE)
+_BOLD_RE = re.compile(r'\*\*(.*?)\*\*')
+
+def _medical_term_html(match: re.Match) -> str:
+    """Wrap a matched status word in its colour-coded span"""
+    term = match.group(1).upper()
+    return f'<span class="medical-term {term.lower()}">{term}</span>'
+
+# Printed page numbers ("Page 2", "Page 2 of 5"); the extractor already marks
+# page boundaries with its own "--- Page N ---" lines
+_PAGE_NUMBER_LINE_RE = re.compile(r'page\s*\d+(?:\s*(?:of|/)\s*\d+)?', re.IGNORECASE)
+
+def _condense_report_text(text: str, max_chars: int = LLM_MAX_REPORT_CHARS) -> str:
+    """Collapse whitespace, drop page numbers and repeated letterhead/footer lines, and cap the length"""
+    kept = []
+    seen = set()
+    size = 0
+    for line in text.split('\n'):
+        line = ' '.join(line.split())
+        if not line or _PAGE_NUMBER_LINE_RE.fullmatch(line):
+            continue
+        # Lab letterheads, addresses and disclaimers repeat on every page;
+        # short lines and our own "--- ... ---" markers are left alone since
+        # those legitimately repeat
+        if len(line) >= 20 and not line.startswith('---'):
+            if line in seen:
+                continue
+            seen.add(line)
+        size += len(line) + 1
+        if size > max_chars:
+            kept.append("[... report truncated ...]")
+            break
+        kept.append(line)
+    return '\n'.join(kept)
+
+@st.cache_resource
+def _get_extraction_pool() -> ProcessPoolExecutor:
+    """Return the long-lived worker pool used for page extraction"""
+    # Kept for the life of the server so each upload doesn't pay to start
+    # and tear down a fresh set of worker processes
+    return ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS)
+
+# Expire cached report text after a day: enough for repeat uploads, without
+# holding patients' reports in server memory indefinitely
+@st.cache_data(show_spinner=False, max_entries=32, ttl=24 * 60 * 60)
+def _extract_pdf_text(pdf_bytes: bytes) -> Tuple[str, int]:
+    """Extract text and tables from PDF bytes, plus how many pages had text; cached per unique file"""
+    import pdfplumber
     
-    def create_html_report(self, analysis_data: Dict[str, Any], patient_name: str = "Patient") -> str:
-        """Create beautiful HTML report that users can print to PDF from browser"""
+    # Open PDF with pdfplumber just to count pages
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        page_count = len(pdf.pages)
+    
+    # pdfminer layout analysis is pure Python, so pages are spread
+    # across worker processes. Each worker gets one contiguous run of
+    # pages so the PDF is opened once per worker, not once per page;
+    # executor.map keeps the runs in page order, and a worker that dies
+    # (e.g. OOM on a huge scan) raises BrokenProcessPool instead of
+    # hanging the upload the way multiprocessing.Pool does
+    processes = max(1, min(page_count, EXTRACTION_WORKERS))
+    step = max(1, -(-page_count // processes))
+    ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+    if len(ranges) > 1:
         try:
-            # Process analysis text for better HTML formatting
-            analysis_text = self.format_analysis_for_html(analysis_data['analysis'])
-            
-            # Create beautiful HTML content with print-friendly CSS
-            html_content = f"""
-            <!DOCTYPE html>
-            <html lang="en">
-            <head>
-                <meta charset="UTF-8">
-                <meta name="viewport" content="width=device-width, initial-scale=1.0">
-                <title>Health Checkup Analysis Report - {patient_name}</title>
-                <style>
-                    /* Medical Report Professional Styles */
-                    :root {{
+            # Spill the PDF to disk once and hand workers its path, rather
+            # than pickling a full copy of the bytes into every job
+            with tempfile.TemporaryDirectory() as tmpdir:
+                pdf_path = os.path.join(tmpdir, "report.pdf")
+                with open(pdf_path, "wb") as f:
+                    f.write(pdf_bytes)
+                
+                jobs = [(pdf_path, start, stop) for start, stop in ranges]
+                try:
+                    results = list(_get_extraction_pool().map(extract_page_range, jobs))
+                    return "".join(text for text, _ in results).strip(), sum(pages for _, pages in results)
+                except BrokenProcessPool:
+                    # A dead worker poisons the executor; drop it so the next
+                    # upload gets a fresh pool
+                    _get_extraction_pool.clear()
+                    raise
+        except (OSError, ImportError, NotImplementedError, pickle.PicklingError):
+            # Locked-down hosts (no /dev/shm, no sem_open) can't start
+            # worker processes, and a job that can't be sent to them is
+            # no reason to fail the upload; fall through to in-process
+            # extraction
+            pass
+    
+    # Single run of pages, or worker processes unavailable
+    extracted_text, text_pages = extract_page_range((io.BytesIO(pdf_bytes), 0, page_count))
+    
+    return extracted_text.strip(), text_pages
+
+# Report sections the analysis is split into: icon, CSS class and heading
+REPORT_SECTIONS = {
+    'SUMMARY': {'icon': '📋', 'class': 'summary', 'title': 'Executive Summary'},
+    'KEY FINDINGS': {'icon': '🔍', 'class': 'findings', 'title': 'Key Findings'},
+    'HEALTH STATUS': {'icon': '💓', 'class': 'health-status', 'title': 'Health Status Assessment'},
+    'LIFESTYLE RECOMMENDATIONS': {'icon': '🏃', 'class': 'lifestyle', 'title': 'Lifestyle Recommendations'},
+    'DIETARY SUGGESTIONS': {'icon': '🥗', 'class': 'dietary', 'title': 'Dietary Suggestions'},
+    'EXERCISE RECOMMENDATIONS': {'icon': '💪', 'class': 'exercise', 'title': 'Exercise Recommendations'},
+    'FOLLOW-UP ACTIONS': {'icon': '🏥', 'class': 'follow-up', 'title': 'Follow-up Actions'},
+    'PREVENTIVE MEASURES': {'icon': '🛡️', 'class': 'preventive', 'title': 'Preventive Measures'}
+}
+_DEFAULT_SECTION = {'icon': '📄', 'class': 'general'}
+
+# A section header is a known section name at the start of a line, either
+# decorated ("3. **HEALTH STATUS**", "## Summary:") or alone on its line, so
+# content that merely mentions a name ("Overall health status is good") stays
+# content. One anchored alternation, matched once per line
+_SECTION_HEADER_RE = re.compile(
+    r'^(?P<prefix>[#*\s]*(?:\d+\.)?[#*\s]*)(?P<key>'
+    + '|'.join(re.escape(key) for key in REPORT_SECTIONS)
+    + r')\b(?P<rest>.*)$',
+    re.IGNORECASE
+)
+
+# Stylesheet for the downloadable HTML report; kept out of the f-string in
+# create_html_report so it isn't re-escaped and re-formatted per report
+REPORT_CSS = """                    /* Medical Report Professional Styles */
+                    :root {
                         --primary-blue: #1e40af;
                         --secondary-blue: #3b82f6;
                         --success-green: #059669;
@@ -263,68 +334,68 @@ Please provide a thorough analysis based on the extracted text content."""
                         --gray-700: #374151;
                         --gray-800: #1f2937;
                         --gray-900: #111827;
-                    }}
+                    }
                     
                     /* Print-Optimized Styles */
-                    @media print {{
-                        @page {{
+                    @media print {
+                        @page {
                             size: A4;
                             margin: 0.5in 0.75in;
-                        }}
+                        }
                         
-                        * {{
+                        * {
                             -webkit-print-color-adjust: exact !important;
                             color-adjust: exact !important;
                             print-color-adjust: exact !important;
-                        }}
+                        }
                         
-                        body {{
+                        body {
                             font-size: 11pt;
                             line-height: 1.3;
                             color: #000;
                             background: white;
-                        }}
+                        }
                         
-                        .no-print {{
+                        .no-print {
                             display: none !important;
-                        }}
+                        }
                         
-                        .medical-section {{
+                        .medical-section {
                             page-break-inside: avoid;
                             break-inside: avoid;
                             margin-bottom: 20px;
-                        }}
+                        }
                         
-                        .section-header {{
+                        .section-header {
                             page-break-after: avoid;
-                        }}
+                        }
                         
-                        .patient-info {{
+                        .patient-info {
                             page-break-after: avoid;
-                        }}
+                        }
                         
-                        .header {{
+                        .header {
                             page-break-after: avoid;
-                        }}
+                        }
                         
-                        h1, h2, h3, h4 {{
+                        h1, h2, h3, h4 {
                             page-break-after: avoid;
-                        }}
+                        }
                         
-                        .container {{
+                        .container {
                             box-shadow: none;
                             border-radius: 0;
                             margin: 0;
                             padding: 0;
-                        }}
-                    }}
+                        }
+                    }
                     
                     /* Base Styles */
-                    * {{
+                    * {
                         box-sizing: border-box;
-                    }}
+                    }
                     
-                    body {{
+                    body {
                         font-family: 'Inter', 'Segoe UI', 'system-ui', -apple-system, sans-serif;
                         line-height: 1.6;
                         color: var(--gray-800);
@@ -332,9 +403,9 @@ Please provide a thorough analysis based on the extracted text content."""
                         padding: 20px;
                         background: var(--gray-50);
                         font-size: 14px;
-                    }}
+                    }
                     
-                    .container {{
+                    .container {
                         max-width: 21cm;
                         margin: 0 auto;
                         background: white;
@@ -342,10 +413,10 @@ Please provide a thorough analysis based on the extracted text content."""
                         border-radius: 8px;
                         box-shadow: 0 10px 25px -5px rgba(0, 0, 0, 0.1), 0 10px 10px -5px rgba(0, 0, 0, 0.04);
                         position: relative;
-                    }}
+                    }
                     
                     /* Print Button */
-                    .print-button {{
+                    .print-button {
                         position: fixed;
                         top: 30px;
                         right: 30px;
@@ -363,49 +434,49 @@ Please provide a thorough analysis based on the extracted text content."""
                         display: flex;
                         align-items: center;
                         gap: 8px;
-                    }}
+                    }
                     
-                    .print-button:hover {{
+                    .print-button:hover {
                         background: #1d4ed8;
                         transform: translateY(-1px);
                         box-shadow: 0 6px 16px rgba(30, 64, 175, 0.5);
-                    }}
+                    }
                     
                     /* Header Section */
-                    .header {{
+                    .header {
                         text-align: center;
                         margin-bottom: 40px;
                         padding-bottom: 30px;
                         border-bottom: 3px solid var(--primary-blue);
                         position: relative;
-                    }}
+                    }
                     
-                    .header h1 {{
+                    .header h1 {
                         color: var(--primary-blue);
                         font-size: 28px;
                         font-weight: 700;
                         margin: 0 0 8px 0;
                         letter-spacing: -0.5px;
-                    }}
+                    }
                     
-                    .header .subtitle {{
+                    .header .subtitle {
                         color: var(--gray-600);
                         font-size: 16px;
                         font-weight: 500;
                         margin: 0;
-                    }}
+                    }
                     
                     /* Patient Information Section */
-                    .patient-info {{
+                    .patient-info {
                         background: linear-gradient(135deg, #eff6ff 0%, #dbeafe 100%);
                         border: 1px solid #bfdbfe;
                         padding: 30px;
                         border-radius: 12px;
                         margin: 30px 0;
                         position: relative;
-                    }}
+                    }
                     
-                    .patient-info h3 {{
+                    .patient-info h3 {
                         color: var(--primary-blue);
                         margin: 0 0 20px 0;
                         font-size: 18px;
@@ -413,23 +484,23 @@ Please provide a thorough analysis based on the extracted text content."""
                         display: flex;
                         align-items: center;
                         gap: 8px;
-                    }}
+                    }
                     
-                    .info-grid {{
+                    .info-grid {
                         display: grid;
                         grid-template-columns: repeat(auto-fit, minmax(280px, 1fr));
                         gap: 16px;
-                    }}
+                    }
                     
-                    .info-item {{
+                    .info-item {
                         background: rgba(255, 255, 255, 0.9);
                         padding: 16px 20px;
                         border-radius: 8px;
                         border-left: 4px solid var(--primary-blue);
                         box-shadow: 0 2px 4px rgba(0, 0, 0, 0.05);
-                    }}
+                    }
                     
-                    .info-label {{
+                    .info-label {
                         font-weight: 600;
                         color: var(--gray-700);
                         display: block;
@@ -437,31 +508,31 @@ Please provide a thorough analysis based on the extracted text content."""
                         margin-bottom: 4px;
                         text-transform: uppercase;
                         letter-spacing: 0.5px;
-                    }}
+                    }
                     
-                    .info-value {{
+                    .info-value {
                         color: var(--primary-blue);
                         font-weight: 600;
                         font-size: 14px;
-                    }}
+                    }
                     
                     /* Medical Sections */
-                    .medical-section {{
+                    .medical-section {
                         margin: 30px 0;
                         background: white;
                         border-radius: 12px;
                         overflow: hidden;
                         box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1), 0 2px 4px -1px rgba(0, 0, 0, 0.06);
                         border: 1px solid var(--gray-200);
-                    }}
+                    }
                     
-                    .section-header {{
+                    .section-header {
                         padding: 20px 30px;
                         background: linear-gradient(135deg, var(--gray-50) 0%, white 100%);
                         border-bottom: 2px solid var(--gray-200);
-                    }}
+                    }
                     
-                    .section-header h3 {{
+                    .section-header h3 {
                         margin: 0;
                         font-size: 18px;
                         font-weight: 700;
@@ -469,94 +540,94 @@ Please provide a thorough analysis based on the extracted text content."""
                         display: flex;
                         align-items: center;
                         gap: 12px;
-                    }}
+                    }
                     
-                    .section-icon {{
+                    .section-icon {
                         font-size: 20px;
                         display: inline-block;
-                    }}
+                    }
                     
-                    .section-content {{
+                    .section-content {
                         padding: 30px;
-                    }}
+                    }
                     
                     /* Section Type Specific Styling */
-                    .medical-section.summary .section-header {{
+                    .medical-section.summary .section-header {
                         background: linear-gradient(135deg, #ecfeff 0%, #cffafe 100%);
                         border-bottom-color: var(--info-cyan);
-                    }}
+                    }
                     
-                    .medical-section.summary .section-header h3 {{
+                    .medical-section.summary .section-header h3 {
                         color: var(--info-cyan);
-                    }}
+                    }
                     
-                    .medical-section.findings .section-header {{
+                    .medical-section.findings .section-header {
                         background: linear-gradient(135deg, #fef3c7 0%, #fed7aa 100%);
                         border-bottom-color: var(--warning-orange);
-                    }}
+                    }
                     
-                    .medical-section.findings .section-header h3 {{
+                    .medical-section.findings .section-header h3 {
                         color: var(--warning-orange);
-                    }}
+                    }
                     
-                    .medical-section.health-status .section-header {{
+                    .medical-section.health-status .section-header {
                         background: linear-gradient(135deg, #fecaca 0%, #fca5a5 100%);
                         border-bottom-color: var(--danger-red);
-                    }}
+                    }
                     
-                    .medical-section.health-status .section-header h3 {{
+                    .medical-section.health-status .section-header h3 {
                         color: var(--danger-red);
-                    }}
+                    }
                     
                     .medical-section.lifestyle .section-header,
                     .medical-section.dietary .section-header,
-                    .medical-section.exercise .section-header {{
+                    .medical-section.exercise .section-header {
                         background: linear-gradient(135deg, #dcfce7 0%, #bbf7d0 100%);
                         border-bottom-color: var(--success-green);
-                    }}
+                    }
                     
                     .medical-section.lifestyle .section-header h3,
                     .medical-section.dietary .section-header h3,
-                    .medical-section.exercise .section-header h3 {{
+                    .medical-section.exercise .section-header h3 {
                         color: var(--success-green);
-                    }}
+                    }
                     
                     .medical-section.follow-up .section-header,
-                    .medical-section.preventive .section-header {{
+                    .medical-section.preventive .section-header {
                         background: linear-gradient(135deg, #e0e7ff 0%, #c7d2fe 100%);
                         border-bottom-color: var(--secondary-blue);
-                    }}
+                    }
                     
                     .medical-section.follow-up .section-header h3,
-                    .medical-section.preventive .section-header h3 {{
+                    .medical-section.preventive .section-header h3 {
                         color: var(--secondary-blue);
-                    }}
+                    }
                     
                     /* Typography */
-                    .sub-heading {{
+                    .sub-heading {
                         color: var(--gray-700);
                         font-size: 16px;
                         font-weight: 600;
                         margin: 25px 0 15px 0;
                         padding-bottom: 8px;
                         border-bottom: 1px solid var(--gray-200);
-                    }}
+                    }
                     
-                    p {{
+                    p {
                         margin: 16px 0;
                         line-height: 1.7;
                         color: var(--gray-700);
                         text-align: justify;
-                    }}
+                    }
                     
                     /* Lists */
-                    .medical-list {{
+                    .medical-list {
                         padding-left: 0;
                         margin: 20px 0;
                         list-style: none;
-                    }}
+                    }
                     
-                    .medical-list li {{
+                    .medical-list li {
                         position: relative;
                         padding: 12px 0 12px 35px;
                         margin: 8px 0;
@@ -567,9 +638,9 @@ Please provide a thorough analysis based on the extracted text content."""
                         background: var(--gray-50);
                         border-radius: 4px;
                         padding: 12px 15px 12px 35px;
-                    }}
+                    }
                     
-                    .medical-list li::before {{
+                    .medical-list li::before {
                         content: '▸';
                         position: absolute;
                         left: 15px;
@@ -577,10 +648,24 @@ Please provide a thorough analysis based on the extracted text content."""
                         color: var(--success-green);
                         font-weight: bold;
                         font-size: 14px;
-                    }}
+                    }
+                    
+                    /* Numbered lists show the model's own numbers in place of the marker */
+                    ol.medical-list li::before {
+                        content: none;
+                    }
+                    
+                    .medical-list .list-number {
+                        position: absolute;
+                        left: 12px;
+                        top: 12px;
+                        color: var(--success-green);
+                        font-weight: bold;
+                        font-size: 14px;
+                    }
                     
                     /* Medical Value Highlighting */
-                    .medical-value {{
+                    .medical-value {
                         background: linear-gradient(135deg, #fef3c7 0%, #fed7aa 100%);
                         color: var(--warning-orange);
                         padding: 2px 6px;
@@ -589,94 +674,102 @@ Please provide a thorough analysis based on the extracted text content."""
                         font-family: 'Monaco', 'Menlo', monospace;
                         font-size: 13px;
                         border: 1px solid #f59e0b;
-                    }}
+                        /* inline-block so the hover scale applies (transforms
+                           are ignored on plain inline boxes) */
+                        display: inline-block;
+                        transition: transform 0.2s ease;
+                    }
+                    
+                    .medical-value:hover {
+                        transform: scale(1.05);
+                    }
                     
-                    .medical-term {{
+                    .medical-term {
                         padding: 2px 6px;
                         border-radius: 4px;
                         font-weight: 600;
                         font-size: 12px;
                         text-transform: uppercase;
                         letter-spacing: 0.5px;
-                    }}
+                    }
                     
                     .medical-term.high,
                     .medical-term.elevated,
-                    .medical-term.critical {{
+                    .medical-term.critical {
                         background: #fecaca;
                         color: var(--danger-red);
                         border: 1px solid #f87171;
-                    }}
+                    }
                     
                     .medical-term.low,
-                    .medical-term.decreased {{
+                    .medical-term.decreased {
                         background: #fed7aa;
                         color: var(--warning-orange);
                         border: 1px solid #fb923c;
-                    }}
+                    }
                     
                     .medical-term.normal,
                     .medical-term.optimal,
-                    .medical-term.good {{
+                    .medical-term.good {
                         background: #bbf7d0;
                         color: var(--success-green);
                         border: 1px solid #4ade80;
-                    }}
+                    }
                     
                     .medical-term.recommended,
-                    .medical-term.maintain {{
+                    .medical-term.maintain {
                         background: #dbeafe;
                         color: var(--primary-blue);
                         border: 1px solid #60a5fa;
-                    }}
+                    }
                     
-                    strong {{
+                    strong {
                         color: var(--gray-800);
                         font-weight: 700;
-                    }}
+                    }
                     
                     /* Disclaimer Section */
-                    .disclaimer {{
+                    .disclaimer {
                         background: linear-gradient(135deg, #fef2f2 0%, #fecaca 100%);
                         border: 2px solid #fca5a5;
                         padding: 30px;
                         border-radius: 12px;
                         margin-top: 50px;
                         position: relative;
-                    }}
+                    }
                     
-                    .disclaimer::before {{
+                    .disclaimer::before {
                         content: '⚠️';
                         position: absolute;
                         top: 25px;
                         right: 25px;
                         font-size: 24px;
-                    }}
+                    }
                     
-                    .disclaimer h3 {{
+                    .disclaimer h3 {
                         color: var(--danger-red);
                         margin: 0 0 20px 0;
                         font-size: 18px;
                         font-weight: 700;
-                    }}
+                    }
                     
-                    .disclaimer p {{
+                    .disclaimer p {
                         margin: 12px 0;
                         font-size: 14px;
                         line-height: 1.6;
                         color: #7f1d1d;
-                    }}
+                    }
                     
                     /* Footer */
-                    .footer {{
+                    .footer {
                         text-align: center;
                         margin-top: 50px;
                         padding-top: 30px;
                         border-top: 2px solid var(--gray-200);
                         color: var(--gray-600);
-                    }}
+                    }
                     
-                    .report-id {{
+                    .report-id {
                         background: var(--gray-100);
                         padding: 8px 16px;
                         border-radius: 6px;
@@ -685,50 +778,58 @@ Please provide a thorough analysis based on the extracted text content."""
                         margin-top: 15px;
                         display: inline-block;
                         color: var(--gray-600);
-                    }}
+                    }
                     
                     /* Responsive Design */
-                    @media (max-width: 768px) {{
-                        .container {{
+                    @media (max-width: 768px) {
+                        .container {
                             padding: 20px;
                             margin: 10px;
-                        }}
+                        }
                         
-                        .info-grid {{
+                        .info-grid {
                             grid-template-columns: 1fr;
-                        }}
+                        }
                         
-                        .section-content {{
+                        .section-content {
                             padding: 20px;
-                        }}
+                        }
                         
-                        .print-button {{
+                        .print-button {
                             top: 20px;
                             right: 20px;
                             padding: 10px 16px;
                             font-size: 12px;
-                        }}
-                    }}
+                        }
+                    }
                     
-                    /* Animation */
-                    .medical-section {{
-                        animation: slideInUp 0.6s ease-out;
-                    }}
+                    /* Animation: sections slide in one after another (the
+                       per-section delays are generated below); "both" keeps
+                       them hidden until their turn */
+                    .medical-section {
+                        animation: slideInUp 0.6s ease-out both;
+                    }
                     
-                    @keyframes slideInUp {{
-                        from {{
+                    @media print {
+                        .medical-section {
+                            animation: none;
+                        }
+                    }
+                    
+                    @keyframes slideInUp {
+                        from {
                             opacity: 0;
                             transform: translateY(20px);
-                        }}
-                        to {{
+                        }
+                        to {
                             opacity: 1;
                             transform: translateY(0);
-                        }}
-                    }}
-                </style>
-                <script>
-                    // Print functionality with user feedback
-                    function printReport() {{
+                        }
+                    }
+"""
+
+REPORT_JS = """                    // Print functionality with user feedback
+                    function printReport() {
                         // Show loading state
                         const button = document.querySelector('.print-button');
                         const originalText = button.innerHTML;
@@ -736,18 +837,18 @@ Please provide a thorough analysis based on the extracted text content."""
                         button.disabled = true;
                         
                         // Trigger print after short delay
-                        setTimeout(function() {{
+                        setTimeout(function() {
                             window.print();
                             // Reset button
-                            setTimeout(function() {{
+                            setTimeout(function() {
                                 button.innerHTML = originalText;
                                 button.disabled = false;
-                            }}, 1000);
-                        }}, 500);
-                    }}
+                            }, 1000);
+                        }, 500);
+                    }
                     
                     // Enhanced print event handling
-                    window.addEventListener('beforeprint', function() {{
+                    window.addEventListener('beforeprint', function() {
                         console.log('🖨️ Printing Health Report - Use "Save as PDF" for best results');
                         
                         // Optimize for print
@@ -761,58 +862,259 @@ Please provide a thorough analysis based on the extracted text content."""
                         document.body.appendChild(printTips);
                         
                         // Remove tips after 3 seconds
-                        setTimeout(function() {{
-                            if (printTips.parentNode) {{
+                        setTimeout(function() {
+                            if (printTips.parentNode) {
                                 printTips.parentNode.removeChild(printTips);
-                            }}
-                        }}, 3000);
-                    }});
+                            }
+                        }, 3000);
+                    });
                     
-                    window.addEventListener('afterprint', function() {{
+                    window.addEventListener('afterprint', function() {
                         console.log('✅ Print dialog closed');
-                    }});
+                    });
                     
                     // Smooth scroll to sections (if we add navigation later)
-                    function scrollToSection(sectionId) {{
+                    function scrollToSection(sectionId) {
                         const element = document.getElementById(sectionId);
-                        if (element) {{
-                            element.scrollIntoView({{ behavior: 'smooth', block: 'start' }});
-                        }}
-                    }}
-                    
-                    // Add loading animation when page loads
-                    document.addEventListener('DOMContentLoaded', function() {{
-                        // Animate sections on load
-                        const sections = document.querySelectorAll('.medical-section');
-                        sections.forEach(function(section, index) {{
-                            section.style.opacity = '0';
-                            section.style.transform = 'translateY(20px)';
-                            
-                            setTimeout(function() {{
-                                section.style.transition = 'all 0.6s ease-out';
-                                section.style.opacity = '1';
-                                section.style.transform = 'translateY(0)';
-                            }}, index * 200);
-                        }});
-                        
-                        // Add hover effects to medical values
-                        const medicalValues = document.querySelectorAll('.medical-value');
-                        medicalValues.forEach(function(value) {{
-                            value.addEventListener('mouseenter', function() {{
-                                this.style.transform = 'scale(1.05)';
-                                this.style.transition = 'transform 0.2s ease';
-                            }});
-                            
-                            value.addEventListener('mouseleave', function() {{
-                                this.style.transform = 'scale(1)';
-                            }});
-                        }});
-                        
-                        console.log('📊 Health Report loaded successfully');
-                    }});
-                </script>
+                        if (element) {
+                            element.scrollIntoView({ behavior: 'smooth', block: 'start' });
+                        }
+                    }
+"""
+
+# Source indentation is pure payload in the downloaded/previewed report:
+# HTML, CSS and JS all treat a bare newline as whitespace
+_INDENTATION_RE = re.compile(r"\n\s+")
+
+def _strip_indentation(markup: str) -> str:
+    """Drop leading whitespace and blank lines from generated markup"""
+    return _INDENTATION_RE.sub("\n", markup)
+
+@st.cache_data(show_spinner=False)
+def _report_head_assets() -> str:
+    """Return everything between the report <title> and <body>, minified; built once per process"""
+    # Staggered slide-in for report sections, 200ms apart, done by the
+    # compositor instead of a load script; sections past the twelfth share
+    # the last delay
+    stagger_css = "".join(
+        f".medical-section:nth-child({n}) {{ animation-delay: {(n - 1) * 0.2:.1f}s; }}\n"
+        for n in range(2, 13)
+    ) + ".medical-section:nth-child(n+13) { animation-delay: 2.4s; }\n"
+    
+    # Streamlit re-runs this whole script on every interaction, so the
+    # comment and indentation stripping is cached here rather than done at
+    # module level on each rerun
+    return _strip_indentation("".join([
+        re.sub(r"/\*.*?\*/", "", REPORT_CSS, flags=re.S),
+        stagger_css,
+        """                </style>
+                <script>
+""",
+        REPORT_JS,
+        """                </script>
             </head>
-            <body>
+""",
+    ]))
+
+class HealthCheckupAnalyzer:
+    def __init__(self):
+        self._session = None
+    
+    def setup_openai(self):
+        """Setup OpenAI API key - Always requires user input"""
+        # Runs on every rerun; only a new session starts with an empty key
+        st.session_state.setdefault('openai_api_key', "")
+    
+    def _get_session(self) -> requests.Session:
+        """Return the keep-alive HTTP session used for OpenAI calls, created on first use"""
+        if self._session is None:
+            # Reusing one session keeps the TCP/TLS connection to the API open
+            # between analyses instead of handshaking on every request
+            self._session = requests.Session()
+            # Ignore proxy (and netrc) settings from the environment for API
+            # calls, without deleting them from the whole process
+            self._session.trust_env = False
+            # trust_env also covers the CA bundle variables, which
+            # TLS-intercepting corporate networks depend on; keep honouring those
+            self._session.verify = os.environ.get("REQUESTS_CA_BUNDLE") or os.environ.get("CURL_CA_BUNDLE") or True
+            # One backed-off retry on connection failures and 429/5xx replies
+            # clips the worst tail latency. Read errors are not retried: the
+            # completion may already be running (and billed)
+            retry = Retry(
+                total=1, read=0, backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=None, raise_on_status=False
+            )
+            self._session.mount("https://", HTTPAdapter(max_retries=retry))
+        return self._session
+    
+    def extract_text_from_pdf(self, pdf_file) -> Tuple[str, int]:
+        """Extract text (and the number of pages with text) from PDF using pdfplumber with layout preservation and table detection"""
+        try:
+            # Cached on the file bytes, so reruns and re-uploads of the
+            # same report skip pdfplumber entirely
+            return _extract_pdf_text(pdf_file.getvalue())
+            
+        except Exception as e:
+            st.error(f"Error extracting text from PDF: {str(e)}")
+            return "", 0
+    
+    def analyze_health_report(self, text: str, language: str, placeholder=None, pages_analyzed: Optional[int] = None) -> Dict[str, Any]:
+        """Analyze health report using OpenAI GPT, streaming partial output into placeholder if given"""
+        try:
+            # Validate API key
+            api_key = st.session_state.openai_api_key
+            if not api_key:
+                st.error("🔑 Please enter your OpenAI API key in the sidebar.")
+                return None
+            
+            if not api_key.startswith('sk-') or len(api_key) < 20:
+                st.error("❌ Invalid API key format. Please check your OpenAI API key.")
+                return None
+            
+            if not text or not text.strip():
+                st.error("📄 No text extracted from PDF to analyze.")
+                return None
+            
+            language_instruction = LANGUAGE_PROMPTS.get(language, LANGUAGE_PROMPTS["English"])
+            
+            # Only the language and report text vary per call; the fixed
+            # instructions live in SYSTEM_PROMPT so the provider can cache them
+            report_text = _condense_report_text(text)
+            prompt = f"{language_instruction}\n\n<report>\n{report_text}\n</report>"
+
+            # Re-analyzing the same report in the same language is common
+            # (re-clicks, switching back and forth), so answer it from the
+            # session cache instead of paying for another completion. The key
+            # ignores whitespace so re-extractions that only differ in spacing
+            # still hit
+            normalized_text = _WHITESPACE_RE.sub(' ', report_text).strip()
+            cache_key = _digest(OPENAI_MODEL, language, normalized_text)
+            llm_cache = st.session_state.setdefault('llm_cache', {})
+            cached = llm_cache.get(cache_key)
+            if cached and cached[1] > time.time():
+                analysis = cached[0]
+            else:
+                # Use OpenAI API directly with requests to bypass client initialization issues
+                
+                headers = {
+                    "Authorization": f"Bearer {api_key}",
+                    "Content-Type": "application/json"
+                }
+                
+                data = {
+                    "model": OPENAI_MODEL,
+                    "messages": [
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    # A low temperature keeps repeat analyses consistent (and
+                    # worth caching); the cap trims rambling tails that add
+                    # latency without adding content
+                    "max_tokens": LLM_MAX_TOKENS.get(language, LLM_MAX_TOKENS_DEFAULT),
+                    "temperature": 0.2,
+                    "stream": True
+                }
+                
+                # Make the API request
+                response = self._get_session().post(
+                    "https://api.openai.com/v1/chat/completions",
+                    headers=headers,
+                    data=_json_dumps(data),
+                    timeout=60,
+                    stream=True
+                )
+                
+                if response.status_code != 200:
+                    st.error(f"OpenAI API error: {response.status_code} - {response.text}")
+                    return None
+                
+                # Consume the server-sent events as they arrive so the user
+                # sees the analysis forming instead of waiting on a spinner
+                chunks = []
+                last_render = 0.0
+                finish_reason = None
+                for line in response.iter_lines():
+                    if not line.startswith(b"data: "):
+                        continue
+                    payload = line[len(b"data: "):]
+                    if payload == b"[DONE]":
+                        break
+                    event = _json_loads(payload)
+                    # Failures after the 200 arrive as an error event in
+                    # the stream rather than as an HTTP status
+                    if 'error' in event:
+                        error = event['error']
+                        message = error.get('message', error) if isinstance(error, dict) else error
+                        if placeholder is not None:
+                            placeholder.empty()
+                        st.error(f"OpenAI API error: {message}")
+                        return None
+                    choice = event['choices'][0]
+                    finish_reason = choice.get('finish_reason') or finish_reason
+                    delta = choice['delta'].get('content')
+                    if delta:
+                        chunks.append(delta)
+                        # Re-joining and re-sending the whole text on every
+                        # token is quadratic and floods the websocket; ~10
+                        # updates a second still reads as live typing
+                        now = time.monotonic()
+                        if placeholder is not None and now - last_render >= 0.1:
+                            placeholder.markdown(''.join(chunks) + "▌")
+                            last_render = now
+                
+                analysis = ''.join(chunks)
+                if finish_reason == "length":
+                    # Cut off at max_tokens: show what arrived, but don't
+                    # serve an incomplete answer from the cache for a day
+                    st.warning("⚠️ The analysis hit the response length limit and may be incomplete.")
+                else:
+                    llm_cache[cache_key] = (analysis, time.time() + LLM_CACHE_TTL_SECONDS)
+            
+            # The extractor already counted the pages; only scan for its
+            # page markers when called without that count
+            if pages_analyzed is None:
+                pages_analyzed = text.count("--- Page") if "--- Page" in text else 1
+            
+            now = datetime.now()
+            return {
+                "analysis": analysis,
+                "timestamp": now.strftime("%Y-%m-%d %H:%M:%S"),
+                # Filename-safe form of the timestamp shown as the report ID
+                "report_id": now.strftime("%Y-%m-%d_%H-%M-%S"),
+                "language": language,
+                "pages_analyzed": pages_analyzed,
+                "extracted_text_length": len(text)
+            }
+            
+        except Exception as e:
+            # Don't leave a half-streamed answer (with its cursor) on screen
+            if placeholder is not None:
+                placeholder.empty()
+            st.error(f"Error analyzing health report: {str(e)}")
+            return None
+    
+    def create_html_report(self, analysis_data: Dict[str, Any], patient_name: str = "Patient") -> str:
+        """Create beautiful HTML report that users can print to PDF from browser"""
+        try:
+            # Process analysis text for better HTML formatting
+            analysis_text = self.format_analysis_for_html(analysis_data['analysis'])
+            
+            # Create beautiful HTML content with print-friendly CSS
+            # The stylesheet and script never change; only the title and the
+            # body carry per-report values, so those are the only f-strings
+            html_content = _strip_indentation("".join([
+                f"""
+            <!DOCTYPE html>
+            <html lang="en">
+            <head>
+                <meta charset="UTF-8">
+                <meta name="viewport" content="width=device-width, initial-scale=1.0">
+                <title>Health Checkup Analysis Report - {patient_name}</title>
+                <style>
+""",
+                _report_head_assets(),
+                f"""            <body>
                 <button class="print-button no-print" onclick="printReport()">
                     🖨️ Print / Save as PDF
                 </button>
@@ -840,7 +1142,7 @@ Please provide a thorough analysis based on the extracted text content."""
                             </div>
                             <div class="info-item">
                                 <span class="info-label">Analysis By</span>
-                                <span class="info-value">AI Health Assistant (GPT-3.5)</span>
+                                <span class="info-value">AI Health Assistant ({OPENAI_MODEL_LABEL})</span>
                             </div>
                             <div class="info-item">
                                 <span class="info-label">Pages Analyzed</span>
@@ -880,7 +1182,7 @@ Please provide a thorough analysis based on the extracted text content."""
                     <div class="disclaimer">
                         <h3>⚠️ IMPORTANT MEDICAL DISCLAIMER</h3>
                         <div style="background: rgba(255,255,255,0.8); padding: 20px; border-radius: 8px; margin: 15px 0;">
-                            <p><strong>🤖 AI-Generated Analysis:</strong> This report is generated by artificial intelligence (GPT-3.5-turbo) and is for <strong>informational purposes only</strong>.</p>
+                            <p><strong>🤖 AI-Generated Analysis:</strong> This report is generated by artificial intelligence ({OPENAI_MODEL_LABEL}) and is for <strong>informational purposes only</strong>.</p>
                             
                             <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); gap: 15px; margin: 20px 0;">
                                 <div style="background: #fef2f2; padding: 15px; border-radius: 6px; border-left: 4px solid #dc2626;">
@@ -909,12 +1211,13 @@ Please provide a thorough analysis based on the extracted text content."""
                     
                     <div class="footer">
                         <p><strong>Generated by Health Checkup Analyzer</strong><br>AI-Powered Medical Report Analysis</p>
-                        <div class="report-id">Report ID: {analysis_data['timestamp'].replace(' ', '_').replace(':', '-')}</div>
+                        <div class="report-id">Report ID: {analysis_data['report_id']}</div>
                     </div>
                 </div>
             </body>
             </html>
-            """
+            """,
+            ])).strip()
             
             return html_content
             
@@ -925,68 +1228,77 @@ Please provide a thorough analysis based on the extracted text content."""
     def format_analysis_for_html(self, analysis_text: str) -> str:
         """Enhanced format analysis text for professional medical report HTML presentation"""
         try:
-            # Define section mapping with icons and CSS classes
-            section_config = {
-                'SUMMARY': {'icon': '📋', 'class': 'summary', 'title': 'Executive Summary'},
-                'KEY FINDINGS': {'icon': '🔍', 'class': 'findings', 'title': 'Key Findings'},
-                'HEALTH STATUS': {'icon': '💓', 'class': 'health-status', 'title': 'Health Status Assessment'},
-                'LIFESTYLE RECOMMENDATIONS': {'icon': '🏃', 'class': 'lifestyle', 'title': 'Lifestyle Recommendations'},
-                'DIETARY SUGGESTIONS': {'icon': '🥗', 'class': 'dietary', 'title': 'Dietary Suggestions'},
-                'EXERCISE RECOMMENDATIONS': {'icon': '💪', 'class': 'exercise', 'title': 'Exercise Recommendations'},
-                'FOLLOW-UP ACTIONS': {'icon': '🏥', 'class': 'follow-up', 'title': 'Follow-up Actions'},
-                'PREVENTIVE MEASURES': {'icon': '🛡️', 'class': 'preventive', 'title': 'Preventive Measures'}
-            }
-            
-            lines = analysis_text.split('\n')
+            # Analysis that already came back as markup is used as is; the
+            # line parser would only wrap its tags in paragraphs
+            stripped = analysis_text.lstrip()
+            if stripped.startswith('<') and '</' in stripped[:200]:
+                return f"""
+                <div class="medical-section general">
+                    <div class="section-header">
+                        <h3><span class="section-icon">📊</span> Health Analysis</h3>
+                    </div>
+                    <div class="section-content">
+                        {analysis_text}
+                    </div>
+                </div>
+                """
+
+            # Stripped, non-empty lines; splitlines() also handles \r\n
+            lines = [line for line in map(str.strip, analysis_text.splitlines()) if line]
             formatted_sections = []
             current_section = None
             current_content = []
             
             for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                
                 # Check for section headers
                 section_found = None
-                for key, config in section_config.items():
-                    if key in line.upper() or any(word in line.upper() for word in key.split()):
-                        section_found = key
-                        break
+                header_rest = ''
+                header_match = _SECTION_HEADER_RE.match(line)
+                if header_match:
+                    rest = header_match.group('rest')
+                    rest_text = rest.strip(' \t*:#-–')
+                    if header_match.group('prefix').strip() or not rest_text:
+                        section_found = header_match.group('key').upper()
+                        # Text after the name is the section's first line only
+                        # when a separator sets it off ("**SUMMARY**: The
+                        # report shows..."); otherwise it is the rest of a
+                        # longer title ("## 1. Summary of Key Results")
+                        if rest.lstrip(' \t*#')[:1] in (':', '-', '–'):
+                            header_rest = rest_text
                 
-                # Check for numbered sections (1., 2., etc.)
-                numbered_match = re.match(r'^(\d+\.)\s*(.+)', line)
-                if numbered_match:
-                    number, title = numbered_match.groups()
-                    section_found = title.upper().strip()
+                # Check for numbered sections (1., 2., etc.). Inside a known
+                # section a numbered line is a list item, not a new section
+                if not section_found and current_section not in REPORT_SECTIONS:
+                    numbered_match = _NUMBERED_LINE_RE.match(line)
+                    if numbered_match:
+                        number, title = numbered_match.groups()
+                        section_found = title.strip(' *#:').upper()
                 
                 if section_found:
                     # Save previous section
                     if current_section and current_content:
-                        formatted_sections.append(self._create_section_html(current_section, current_content, section_config))
+                        formatted_sections.append(self._create_section_html(current_section, current_content))
                     
                     # Start new section
                     current_section = section_found
-                    current_content = []
+                    current_content = [header_rest] if header_rest else []
                 else:
                     # Add content to current section
-                    if line:
-                        current_content.append(line)
+                    current_content.append(line)
             
             # Add final section
             if current_section and current_content:
-                formatted_sections.append(self._create_section_html(current_section, current_content, section_config))
+                formatted_sections.append(self._create_section_html(current_section, current_content))
             
             # If no sections found, create a general analysis section
             if not formatted_sections:
-                tt = analysis_text.split('\n')
                 return f"""
                 <div class="medical-section general">
                     <div class="section-header">
                         <h3><span class="section-icon">📊</span> Health Analysis</h3>
                     </div>
                     <div class="section-content">
-                        {self._format_content_to_html(tt)}
+                        {self._format_content_to_html(lines)}
                     </div>
                 </div>
                 """
@@ -1012,14 +1324,12 @@ Please provide a thorough analysis based on the extracted text content."""
             </div>
             """
     
-    def _create_section_html(self, section_key: str, content_lines: list, section_config: dict) -> str:
+    def _create_section_html(self, section_key: str, content_lines: list) -> str:
         """Create professional HTML section with proper styling"""
         # Get section configuration
-        config = section_config.get(section_key, {
-            'icon': '📄', 
-            'class': 'general',
-            'title': section_key.title()
-        })
+        config = REPORT_SECTIONS.get(section_key)
+        if config is None:
+            config = {**_DEFAULT_SECTION, 'title': section_key.title()}
         
         # Format content
         formatted_content = self._format_content_to_html(content_lines)
@@ -1036,34 +1346,44 @@ Please provide a thorough analysis based on the extracted text content."""
         """
     
     def _format_content_to_html(self, content_lines: list) -> str:
-        """Format content lines into proper HTML with lists, emphasis, etc."""
+        """Format content lines into proper HTML with lists, emphasis, etc.
+
+        Lines are expected stripped and non-empty, as format_analysis_for_html
+        passes them.
+        """
+        # List items go straight into the output between the list's opening
+        # and closing tags rather than into a separate list joined on close.
+        # list_tag is the open list ('ul' or 'ol'), or None
         html_content = []
-        current_list = []
-        in_list = False
+        list_tag = None
         
         for line in content_lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Check for bullet points
-            if line.startswith('-') or line.startswith('•') or line.startswith('*'):
-                if not in_list:
-                    in_list = True
-                    current_list = []
+            numbered_match = _NUMBERED_ITEM_RE.match(line)
+            if numbered_match or line.startswith(('-', '•', '*')):
+                tag = 'ol' if numbered_match else 'ul'
+                if list_tag != tag:
+                    if list_tag:
+                        html_content.append(f"</{list_tag}>")
+                    list_tag = tag
+                    html_content.append(f"<{tag} class='medical-list'>")
                 
-                # Clean up bullet point
-                clean_line = line[1:].strip()
-                # Highlight important values and ranges
-                clean_line = self._highlight_medical_values(clean_line)
-                current_list.append(f"<li>{clean_line}</li>")
+                if numbered_match:
+                    # Keep the model's number, outside the value highlighting
+                    # so it isn't badged as a lab value
+                    number, item = numbered_match.groups()
+                    html_content.append(f"<li><span class='list-number'>{number}</span>{self._highlight_medical_values(item)}</li>")
+                else:
+                    # Clean up bullet point
+                    clean_line = line[1:].strip()
+                    # Highlight important values and ranges
+                    clean_line = self._highlight_medical_values(clean_line)
+                    html_content.append(f"<li>{clean_line}</li>")
             
             else:
                 # Close current list if we were in one
-                if in_list:
-                    html_content.append(f"<ul class='medical-list'>{''.join(current_list)}</ul>")
-                    current_list = []
-                    in_list = False
+                if list_tag:
+                    html_content.append(f"</{list_tag}>")
+                    list_tag = None
                 
                 # Format regular paragraph
                 formatted_line = self._highlight_medical_values(line)
@@ -1075,36 +1395,115 @@ Please provide a thorough analysis based on the extracted text content."""
                     html_content.append(f"<p>{formatted_line}</p>")
         
         # Close any remaining list
-        if in_list and current_list:
-            html_content.append(f"<ul class='medical-list'>{''.join(current_list)}</ul>")
+        if list_tag:
+            html_content.append(f"</{list_tag}>")
         
         return ''.join(html_content)
     
     def _highlight_medical_values(self, text: str) -> str:
         """Highlight medical values, ranges, and important terms"""
         # Highlight numerical values and ranges
-        text = re.sub(r'(\d+(?:\.\d+)?(?:\s*[-–]\s*\d+(?:\.\d+)?)?(?:\s*(?:mg|g|kg|lb|cm|mm|%|bpm|mmHg|mg/dL|g/dL|mL|L|units?|IU)\b)?)', 
-                     r'<span class="medical-value">\1</span>', text)
-        
-        # Highlight important medical terms
-        important_terms = [
-            'HIGH', 'LOW', 'NORMAL', 'ABNORMAL', 'CRITICAL', 'URGENT', 'IMMEDIATE',
-            'ELEVATED', 'DECREASED', 'BORDERLINE', 'OPTIMAL', 'GOOD', 'POOR',
-            'RECOMMENDED', 'AVOID', 'INCREASE', 'DECREASE', 'MAINTAIN', 'MONITOR'
-        ]
+        text = _MEDICAL_VALUE_RE.sub(r'<span class="medical-value">\1</span>', text)
         
-        for term in important_terms:
-            text = re.sub(f'\\b{term}\\b', f'<span class="medical-term {term.lower()}">{term}</span>', text, flags=re.IGNORECASE)
+        # Highlight important medical terms, all in one pass
+        text = _MEDICAL_TERM_RE.sub(_medical_term_html, text)
         
         # Bold important phrases
-        text = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', text)
+        text = _BOLD_RE.sub(r'<strong>\1</strong>', text)
         
         return text
     
 
 
+@st.cache_resource
+def get_analyzer() -> HealthCheckupAnalyzer:
+    """Return the analyzer shared across reruns and sessions"""
+    return HealthCheckupAnalyzer()
+
+# The report only depends on the analysis and the patient name, so reruns
+# (preview toggles, re-analysing a cached result) reuse the rendered HTML;
+# the spinner only shows when the report is actually built
+@st.cache_data(show_spinner="📄 Generating beautiful HTML report...", ttl=60 * 60, max_entries=32)
+def build_html_report(analysis_data: Dict[str, Any], patient_name: str) -> Optional[str]:
+    """Return the HTML report for an analysis result, cached per (analysis, patient name)"""
+    return get_analyzer().create_html_report(analysis_data, patient_name)
+
+# Download, preview toggle and preview iframe rerun on their own: clicking
+# them does not re-execute the upload, extraction and analysis above
+@st.fragment
+def report_panel(analysis_result: Dict[str, Any], result_key: str, patient_name: str):
+    """Render the download/preview panel for an analysis result"""
+    # Generate HTML Report
+    st.subheader("📥 Get Your Report")
+    
+    # Keep the rendered report, its UTF-8 bytes and its file name for this
+    # analysis/name pair, so reruns hand the download button and the
+    # preview the same objects instead of re-hashing the analysis for the
+    # cache and re-encoding the report (and the download button's
+    # arguments stay stable instead of getting a new timestamp each run).
+    # result_key only names the file and language; a re-analysis of the
+    # same file is a new analysis with its own report_id
+    report_key = (result_key, analysis_result['report_id'], patient_name)
+    if st.session_state.get('report_key') != report_key:
+        html_content = build_html_report(analysis_result, patient_name)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        st.session_state.report_key = report_key
+        st.session_state.report_html = html_content
+        st.session_state.report_bytes = html_content.encode('utf-8') if html_content else None
+        st.session_state.report_filename = f"health_analysis_{patient_name}_{timestamp}.html"
+    html_content = st.session_state.report_html
+    
+    if html_content:
+        # Create two columns for different options
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.download_button(
+                label="📥 Download HTML Report",
+                data=st.session_state.report_bytes,
+                file_name=st.session_state.report_filename,
+                mime="text/html",
+                type="primary"
+            )
+        
+        with col2:
+            # Toggle the preview; the callback flips the flag before
+            # the rerun, so the full report iframe is only sent to
+            # the browser while the preview is actually open
+            showing = st.session_state.get('show_preview', False)
+            st.button(
+                "🙈 Hide Preview" if showing else "👀 Preview Report",
+                type="secondary",
+                on_click=lambda: st.session_state.update(show_preview=not showing)
+            )
+        
+        st.markdown(f"""
+        <div class="success-box">
+            <b>✅ Success!</b><br/>
+            Your health report analysis is ready! 
+            <br><br>
+            <b>📥 Download HTML:</b> Save the file and open in your browser<br/>
+            <b>🖨️ Print to PDF:</b> Open the HTML file → Press Ctrl+P → Save as PDF<br/>
+            <b>👀 Preview:</b> See how the report looks before downloading<br/>
+            <b>📊 Analysis:</b> {analysis_result['pages_analyzed']} pages analyzed with {OPENAI_MODEL_LABEL}
+        </div>
+        """, unsafe_allow_html=True)
+        
+        # Show preview if requested
+        if st.session_state.get('show_preview', False):
+            st.subheader("📄 Report Preview")
+            st.markdown("*This is how your report will look. Use the 'Download HTML Report' button above to save it.*")
+            
+            # Display the HTML in an iframe-like container, sized from the
+            # analysis length so the page scrolls instead of the iframe
+            # (which still scrolls if the estimate falls short)
+            preview_height = min(PREVIEW_MAX_HEIGHT, 700 + len(analysis_result['analysis']) // 3)
+            st.components.v1.html(html_content, height=preview_height, scrolling=True)
+
 def main():
-    analyzer = HealthCheckupAnalyzer()
+    analyzer = get_analyzer()
+    # The analyzer is shared, but session state is per browser session
+    analyzer.setup_openai()
     
     # Header
     st.markdown('<div class="main-header">🏥 Health Checkup Analyzer</div>', unsafe_allow_html=True)
@@ -1155,7 +1554,7 @@ def main():
         # Language selection
         language = st.selectbox(
             "Select Language",
-            ["English", "Hindi", "Hinglish"],
+            list(LANGUAGE_PROMPTS),
             help="Choose the language for analysis output"
         )
         
@@ -1169,12 +1568,12 @@ def main():
         st.divider()
         
         # Features info
-        st.markdown("""
+        st.markdown(f"""
         ### 🎯 Features
         - 📄 Upload PDF health reports
         - 🔤 **pdfplumber extraction**: Superior layout preservation
         - 📊 **Automatic table detection** and extraction
-        - 🤖 GPT-3.5-turbo analysis
+        - 🤖 {OPENAI_MODEL_LABEL} analysis
         - 🌐 Multi-language support  
         - 📋 Multi-page text analysis
         - 💡 Detailed recommendations
@@ -1209,8 +1608,8 @@ def main():
         
         with col1:
             st.subheader("📄 File Details")
-            for key, value in file_details.items():
-                st.write(f"**{key}:** {value}")
+            # One markdown element (hard line breaks) instead of one per field
+            st.markdown("  \n".join(f"**{key}:** {value}" for key, value in file_details.items()))
         
         with col2:
             st.write("📄 PDF file uploaded successfully")
@@ -1218,9 +1617,9 @@ def main():
         
         # Extract text from PDF using pdfplumber
         with st.spinner("📄 Extracting text and tables from PDF using pdfplumber..."):
-            extracted_text = analyzer.extract_text_from_pdf(uploaded_file)
+            extracted_text, text_pages = analyzer.extract_text_from_pdf(uploaded_file)
         
-        if extracted_text and extracted_text.strip():
+        if len(extracted_text) >= MIN_REPORT_TEXT_CHARS:
             st.success(f"✅ Successfully extracted text from PDF ({len(extracted_text)} characters)")
             
             # Show extracted text preview
@@ -1234,71 +1633,38 @@ def main():
                 if len(extracted_text) > 2000:
                     st.info(f"Showing first 2000 characters. Total extracted: {len(extracted_text)} characters")
             
+            # The latest result is kept in session_state so reruns (Preview,
+            # sidebar edits) redisplay it instead of dropping it until the
+            # user analyzes again; it is tied to the report text and language
+            result_key = _digest(language, extracted_text)
+            stored_result = st.session_state.get('analysis_result')
+            analysis_result = stored_result[1] if stored_result and stored_result[0] == result_key else None
+            
             # Analyze button
             if st.button("🔬 Analyze Health Report", type="primary"):
                 if not st.session_state.openai_api_key:
                     st.error("Please enter your OpenAI API key in the sidebar.")
+                    analysis_result = None
                 else:
+                    # Display analysis, streamed into place as it is generated
+                    st.markdown("## 📊 Health Analysis Results")
+                    analysis_placeholder = st.empty()
                     with st.spinner("🤖 Analyzing your health report with AI..."):
-                        analysis_result = analyzer.analyze_health_report(extracted_text, language)
+                        analysis_result = analyzer.analyze_health_report(extracted_text, language, analysis_placeholder, text_pages)
                     
                     if analysis_result:
-                        st.success(f"✅ Analysis completed successfully! Analyzed {analysis_result['pages_analyzed']} pages ({analysis_result['extracted_text_length']} characters).")
-                        
-                        # Display analysis
-                        st.markdown('<div class="analysis-result">', unsafe_allow_html=True)
-                        st.markdown("## 📊 Health Analysis Results")
-                        st.markdown(analysis_result['analysis'])
-                        st.markdown('</div>', unsafe_allow_html=True)
-                        
-                        # Generate HTML Report
-                        st.subheader("📥 Get Your Report")
-                        
-                        with st.spinner("📄 Generating beautiful HTML report..."):
-                            html_content = analyzer.create_html_report(analysis_result, patient_name)
-                        
-                        if html_content:
-                            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                            filename = f"health_analysis_{patient_name}_{timestamp}.html"
-                            
-                            # Create two columns for different options
-                            col1, col2 = st.columns(2)
-                            
-                            with col1:
-                                st.download_button(
-                                    label="📥 Download HTML Report",
-                                    data=html_content.encode('utf-8'),
-                                    file_name=filename,
-                                    mime="text/html",
-                                    type="primary"
-                                )
-                            
-                            with col2:
-                                # Create a temporary display of the HTML
-                                if st.button("👀 Preview Report", type="secondary"):
-                                    st.session_state.show_preview = True
-                            
-                            st.markdown(f"""
-                            <div class="success-box">
-                                <b>✅ Success!</b><br/>
-                                Your health report analysis is ready! 
-                                <br><br>
-                                <b>📥 Download HTML:</b> Save the file and open in your browser<br/>
-                                <b>🖨️ Print to PDF:</b> Open the HTML file → Press Ctrl+P → Save as PDF<br/>
-                                <b>👀 Preview:</b> See how the report looks before downloading<br/>
-                                <b>📊 Analysis:</b> {analysis_result['pages_analyzed']} pages analyzed with GPT-3.5-turbo
-                            </div>
-                            """, unsafe_allow_html=True)
-                            
-                            # Show preview if requested
-                            if st.session_state.get('show_preview', False):
-                                st.subheader("📄 Report Preview")
-                                st.markdown("*This is how your report will look. Use the 'Download HTML Report' button above to save it.*")
-                                
-                                # Display the HTML in an iframe-like container
-                                st.components.v1.html(html_content, height=800, scrolling=True)
+                        st.session_state.analysis_result = (result_key, analysis_result)
+                        analysis_placeholder.markdown(analysis_result['analysis'])
+            elif analysis_result:
+                st.markdown("## 📊 Health Analysis Results")
+                st.markdown(analysis_result['analysis'])
+            
+            if analysis_result:
+                st.success(f"✅ Analysis completed successfully! Analyzed {analysis_result['pages_analyzed']} pages ({analysis_result['extracted_text_length']} characters).")
+                
+                report_panel(analysis_result, result_key, patient_name)
         else:
-            st.error("❌ Could not extract text from PDF. The PDF might be image-based, password-protected, or corrupted. Please ensure the PDF contains extractable text.")
+            st.error("❌ Could not extract enough text from PDF. The PDF might be image-based, password-protected, or corrupted. Please ensure the PDF contains extractable text.")
     
     # Footer
     st.divider()
@@ -0,0 +1,55 @@
+"""
+PDF page extraction for Health Checkup Analyzer.
+
+Kept out of the Streamlit script so worker processes can import it by name:
+Streamlit re-creates the script's __main__ module on every run, so a
+function defined there does not pickle reliably.
+"""
+
+from typing import Tuple
+
+def extract_page_range(job) -> Tuple[str, int]:
+    """Extract text and tables from a run of PDF pages, plus how many had text (runs in a worker process)"""
+    # pdfplumber (and pdfminer under it) is imported on first extraction,
+    # not on the first page render
+    import pdfplumber  # PDF text extraction with layout preservation
+    
+    pdf_source, start, stop = job
+    # Collected as parts and joined once; += on a growing str recopies it
+    parts = []
+    text_pages = 0
+    
+    with pdfplumber.open(pdf_source) as pdf:
+        for page_num in range(start, stop):
+            # Lab reports often fake bold by drawing each glyph twice; drop
+            # the duplicates so text and table passes see half the chars and
+            # values like "HHIIGGHH" come out clean
+            source_page = pdf.pages[page_num]
+            page = source_page.dedupe_chars()
+            
+            # Extract text with layout preservation
+            page_text = page.extract_text()
+            
+            if page_text and page_text.strip():
+                text_pages += 1
+                parts.append(f"\n--- Page {page_num + 1} ---\n")
+                parts.append(page_text + "\n")
+                
+                # Also extract tables if any. The default "lines" strategy can
+                # only find tables drawn with ruling lines/rects, so skip the
+                # table finder entirely on pages that have no edges
+                tables = page.extract_tables() if page.edges else []
+                if tables:
+                    parts.append("\n--- Tables on this page ---\n")
+                    for table_num, table in enumerate(tables):
+                        parts.append(f"Table {table_num + 1}:\n")
+                        for row in table:
+                            if row and any(row):
+                                parts.append(" | ".join(cell or "" for cell in row) + "\n")
+                        parts.append("\n")
+            
+            # pdf.pages keeps every Page alive, so drop this page's parsed
+            # layout once done; memory stays flat across a long page run
+            source_page.flush_cache()
+    
+    return "".join(parts), text_pages
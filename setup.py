@@ -8,11 +8,17 @@ import subprocess
 import sys
 import os
 import platform
+import shutil
+import importlib.util
+import importlib.metadata
 
-def run_command(command):
-    """Run a command and return success status"""
+# Directory of pre-downloaded wheels for offline installs, if present
+WHEELHOUSE_DIR = "wheelhouse"
+
+def run_command(argv):
+    """Run a command (argument list, no shell) and return success status"""
     try:
-        result = subprocess.run(command, shell=True, capture_output=True, text=True)
+        result = subprocess.run(argv, capture_output=True, text=True)
         return result.returncode == 0, result.stdout, result.stderr
     except Exception as e:
         return False, "", str(e)
@@ -20,7 +26,7 @@ def run_command(command):
 def check_python_version():
     """Check if Python version is 3.8+"""
     version = sys.version_info
-    if version.major >= 3 and version.minor >= 8:
+    if version >= (3, 8):
         print(f"✅ Python {version.major}.{version.minor}.{version.micro} - OK")
         return True
     else:
@@ -29,7 +35,9 @@ def check_python_version():
 
 def check_pip():
     """Check if pip is available"""
-    success, _, _ = run_command("pip --version")
+    # "python -m pip" only needs pip importable here; no need to start
+    # a second interpreter to find out
+    success = importlib.util.find_spec("pip") is not None
     if success:
         print("✅ pip - OK")
         return True
@@ -37,10 +45,45 @@ def check_pip():
         print("❌ pip not found")
         return False
 
+def requirements_satisfied(path="requirements.txt"):
+    """Check if every requirement is an exact pin that is already installed"""
+    with open(path) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            # Anything but "name==version" is left for pip to resolve
+            name, sep, wanted = line.partition("==")
+            if not sep or not wanted.strip():
+                return False
+            try:
+                if importlib.metadata.version(name.strip()) != wanted.strip():
+                    return False
+            except importlib.metadata.PackageNotFoundError:
+                return False
+    return True
+
 def install_requirements():
     """Install Python requirements"""
+    # A repeat run with everything already pinned and installed has
+    # nothing for pip to do
+    if requirements_satisfied():
+        print("\n✅ Python dependencies already installed")
+        return True
+    
     print("\n📦 Installing Python dependencies...")
-    success, stdout, stderr = run_command("pip install -r requirements.txt")
+    # pip already keeps a persistent wheel cache; prefer wheels over sdist
+    # builds and skip its PyPI self-update check
+    argv = [
+        sys.executable, "-m", "pip", "install",
+        "--prefer-binary", "--no-input", "--disable-pip-version-check",
+        "-r", "requirements.txt"
+    ]
+    # Install offline from pre-downloaded wheels when a wheelhouse/ exists
+    # (pip download -r requirements.txt -d wheelhouse)
+    if os.path.isdir(WHEELHOUSE_DIR):
+        argv += ["--no-index", "--find-links", WHEELHOUSE_DIR]
+    success, stdout, stderr = run_command(argv)
     if success:
         print("✅ Dependencies installed successfully")
         return True
@@ -50,7 +93,8 @@ def install_requirements():
 
 def check_tesseract():
     """Check if Tesseract is installed"""
-    success, stdout, stderr = run_command("tesseract --version")
+    # A PATH lookup is the same search subprocess would do before exec
+    success = shutil.which("tesseract") is not None
     if success:
         print("✅ Tesseract OCR - OK")
         return True
@@ -58,39 +102,36 @@ def check_tesseract():
         print("❌ Tesseract OCR not found")
         return False
 
+# Tesseract install instructions per platform.system().lower()
+TESSERACT_GUIDES = {
+    "darwin": """For macOS:
+brew install tesseract
+
+If you don't have Homebrew:
+1. Install Homebrew: https://brew.sh/
+2. Then run: brew install tesseract""",
+    "linux": """For Ubuntu/Debian:
+sudo apt-get update
+sudo apt-get install tesseract-ocr
+sudo apt-get install libtesseract-dev
+
+For CentOS/RHEL:
+sudo yum install tesseract""",
+    "windows": """For Windows:
+1. Download Tesseract from:
+   https://github.com/UB-Mannheim/tesseract/wiki
+2. Install the executable
+3. Add Tesseract to your PATH environment variable""",
+}
+DEFAULT_TESSERACT_GUIDE = """Please install Tesseract OCR for your operating system
+Visit: https://tesseract-ocr.github.io/tessdoc/Installation.html"""
+
 def install_tesseract_guide():
     """Provide instructions for installing Tesseract"""
-    system = platform.system().lower()
-    
+    guide = TESSERACT_GUIDES.get(platform.system().lower(), DEFAULT_TESSERACT_GUIDE)
     print("\n🔧 Tesseract Installation Guide:")
     print("=" * 50)
-    
-    if system == "darwin":  # macOS
-        print("For macOS:")
-        print("brew install tesseract")
-        print("\nIf you don't have Homebrew:")
-        print("1. Install Homebrew: https://brew.sh/")
-        print("2. Then run: brew install tesseract")
-        
-    elif system == "linux":
-        print("For Ubuntu/Debian:")
-        print("sudo apt-get update")
-        print("sudo apt-get install tesseract-ocr")
-        print("sudo apt-get install libtesseract-dev")
-        
-        print("\nFor CentOS/RHEL:")
-        print("sudo yum install tesseract")
-        
-    elif system == "windows":
-        print("For Windows:")
-        print("1. Download Tesseract from:")
-        print("   https://github.com/UB-Mannheim/tesseract/wiki")
-        print("2. Install the executable")
-        print("3. Add Tesseract to your PATH environment variable")
-        
-    else:
-        print("Please install Tesseract OCR for your operating system")
-        print("Visit: https://tesseract-ocr.github.io/tessdoc/Installation.html")
+    print(guide)
 
 def main():
     """Main setup function"""
@@ -121,13 +162,15 @@ def main():
         return False
     
     # Install Python dependencies
-    if os.path.exists("requirements.txt"):
+    # install_requirements reads requirements.txt first thing, so a missing
+    # file shows up there rather than needing its own existence check
+    try:
         install_success = install_requirements()
-        if not install_success:
-            return False
-    else:
+    except FileNotFoundError:
         print("❌ requirements.txt not found")
         return False
+    if not install_success:
+        return False
     
     # Final success message
     print("\n🎉 Setup completed successfully!")